@@ -5,8 +5,20 @@
 import time
 import sys
 import logging
-from itertools import groupby
 import random
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # python < 3.10
+    def popcount(bb):
+        return bin(bb).count('1')
+
+
+class SearchTimeout(Exception):
+    # raised from deep in the search when the deadline passes, the depth being searched is abandoned
+    pass
 
 
 class GameStats:
@@ -31,13 +43,6 @@ class GameStats:
             s += turn.end_count
         return s
 
-    @property
-    def end_cache_hit(self):
-        s = 0
-        for turn in self.turns:
-            s += turn.end_cache_hit
-        return s
-
     @property
     def eval_count(self):
         s = 0
@@ -88,7 +93,7 @@ class GameStats:
         return F'\n' \
             + F'6(b)i   Average evaluation time: {self.avg_time}' \
             + F'\n6(b)ii  Total heuristic evaluations: {self.eval_count} (cached:{self.eval_cache_hit})' \
-            + F' + Endgames found: {self.end_count} (cached:{self.end_cache_hit})' \
+            + F' + Endgames found: {self.end_count}' \
             + F'\n6(b)iii Total Evaluations by depth: {self.eval_by_depth}' \
             + F'\n6(b)iii Average Evaluations by depth: {self.avg_eval_by_depth}' \
             + F'\n6(b)iv  Average evaluation depth: {self.avg_eval_depth}' \
@@ -101,15 +106,18 @@ class GameStats:
 
 
 class TurnStats:
-    def __init__(self):
+    def __init__(self, depth=0):
         self.elapsed = 0
         self.end_count = 0
-        self.end_cache_hit = 0
         self.eval_count = 0
         self.eval_cache_hit = 0
-        self.eval_by_depth = {}
+        self.evals = [0] * (depth + 1)  # evaluations indexed by ply, counted in the search
         self.avg_recursion_depth = 0
 
+    @property
+    def eval_by_depth(self):
+        return {depth: count for depth, count in enumerate(self.evals) if count}
+
     @property
     def avg_eval_depth(self):
         sum = 0
@@ -127,7 +135,7 @@ class TurnStats:
         return F'\n' \
             + F'i   Evaluation time: {self.elapsed}s' \
             + F'\nii  Heuristic evaluations: {self.eval_count} (cached:{self.eval_cache_hit})' \
-            + F' + Endgames found: {self.end_count} (cached:{self.end_cache_hit})' \
+            + F' + Endgames found: {self.end_count}' \
             + F'\niii Evaluations by depth: {eval_by_depth}' \
             + F'\niv  Average evaluation depth: {self.avg_eval_depth}' \
             + F'\nv   Average recursion depth: {self.avg_recursion_depth}' \
@@ -136,6 +144,15 @@ class TurnStats:
     def summary(self):
         logging.info(self)
 
+    def merge(self, other):
+        self.end_count += other.end_count
+        self.eval_count += other.eval_count
+        self.eval_cache_hit += other.eval_cache_hit
+        if len(other.evals) > len(self.evals):
+            self.evals += [0] * (len(other.evals) - len(self.evals))
+        for depth, count in enumerate(other.evals):
+            self.evals[depth] += count
+
 
 class Player:
     MINIMAX = 0
@@ -187,13 +204,29 @@ class Player:
         else:
             a = 'minimax'
 
-        logging.info(F'Player {self.symbol}: {t} d={self.depth} a={a} {h}')
+        logging.info('Player %s: %s d=%s a=%s %s', self.symbol, t, self.depth, a, h)
 
 
 class Game:
     LETTERS = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J']
     MINIMAX = 0
     ALPHABETA = 1
+    # transposition table entry bounds
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+    TT_SIZE = 1 << 20
+    SCOUT = 1e-9  # width of the null window, scores are floats so it can't be zero
+    # the clock is read once every 128 nodes, at up to ~100 us a node that stays well inside the leeway
+    TIME_CHECK = (1 << 7) - 1
+    # no per instance dict, the search reads these attributes at every node
+    __slots__ = ('n', 's', 'b', 'blocs', 'a', 'd1', 'd2', 't', 'leeway', 'id_growth', 'aspiration', 'quiescence',
+                 'eval_cache', 'minimax_by_alphabeta', 'recommend', 'workers', 'pool', 'cancelled',
+                 'x_bb', 'o_bb', 'bloc_bb', 'full_mask', 'win_masks', 'line_dirs', 'window_dirs', 'centrality',
+                 'lines_through', 'zobrist', 'zhash', 'bloc_hash', 'symmetries', 'sym_keys', 'sym_hashes',
+                 'board_header', 'row_labels', 'state_eval1', 'e1_scale', 'pow10',
+                 'player_x', 'player_o', 'active_player', 'game_stats', 'turn_stats', 'result',
+                 'deadline', 'nodes', 'max_depth', 'tt', 'killers', 'history', 'root_scores', 'pv_move')
 
     # (a) the n of the board – n – an integer in [3..10]
     # (b) the number of blocs – b – an integer in [0..2n]
@@ -212,7 +245,7 @@ class Game:
     # be able to run your program in all 4 combinations of players: H-H, H-AI, AI-H and AI-AI
 
     def __init__(self, n=3, b=0, s=3, blocs=None, a=None, d1=5, d2=5, t=10, recommend=True,
-                 gametrace_logfile=None):
+                 gametrace_logfile=None, workers=1):
         self.n = n  # size of board
         self.s = s  # size of winning line
         self.b = b  # size of blocs
@@ -222,10 +255,15 @@ class Game:
         self.d2 = d2  # p2 search depth
         self.t = t  # search timeout
         self.leeway = 0.05
+        self.id_growth = 2  # least factor the search time is expected to grow by from one depth to the next
+        self.aspiration = 0.25  # half width of the alphabeta window around the last depth's score
+        self.quiescence = 4  # plies of forced blocks searched past the depth limit
+        self.eval_cache = True  # remember e1 scores by zobrist hash
+        self.minimax_by_alphabeta = False  # answer minimax players with alphabeta, same values with fewer nodes
         self.recommend = recommend  # recommend human moves
-        # helpers for determining diagonals to read
-        self.max_diag = 2 * self.n - 1 - 2 * (self.s - 1)
-        self.split_diag = int((self.max_diag - 1) / 2)
+        self.workers = workers  # processes searching root moves in parallel
+        self.pool = None
+        self.cancelled = None  # set while the parallel search stops its running workers
 
         if gametrace_logfile is not None:
             logging.basicConfig(level=logging.INFO, format='%(message)s', filename=gametrace_logfile, filemode='w')
@@ -233,7 +271,7 @@ class Game:
             console.setLevel(logging.INFO)
 
             logging.getLogger().addHandler(console)
-            logging.debug('DEBUG: gametrace will be written to ' + gametrace_logfile)
+            logging.debug('DEBUG: gametrace will be written to %s', gametrace_logfile)
         else:
             # print info level logging to console
             logging.basicConfig(level=logging.DEBUG, format='%(message)s')
@@ -262,169 +300,257 @@ class Game:
 
     def initialize_game(self):
         self.validate()
-        board = []
+        # cell (x, y) maps to bit y * n + x of each bitboard
+        self.x_bb = 0
+        self.o_bb = 0
+        self.bloc_bb = 0
+        self.full_mask = (1 << (self.n * self.n)) - 1
+        bloc_cells = {self._normalize_bloc(bloc) for bloc in self.blocs}
         for y in range(self.n):
-            row = []
             for x in range(self.n):
-                for bloc in self.blocs:
-                    if type(bloc) is str or (type(bloc) is tuple and type(bloc[0]) is str):
-                        bloc = (ord(bloc[0].upper()) - 65, int(bloc[1]))
-                    if type(bloc) is tuple and type(bloc[1]) is str:
-                        # I don't like the weird (2, 'D') syntax so let's invert it back
-                        bloc = (ord(bloc[1].upper()) - 65, int(bloc[0]))
-                    # inverted for check, but api supports (x,y) or 'XY' or ('X', y) or (y, 'X')
-                    if bloc == (y, x):
-                        row.append('*')
-                        break
-                else:
-                    row.append('.')
-            board.append(row)
-        self.current_state = board
+                if (x, y) in bloc_cells:
+                    self.bloc_bb |= 1 << (y * self.n + x)
+        self._compute_line_geometry()
+        # zobrist keys for X, O and bloc on every cell, fixed seed so runs are reproducible
+        rng = random.Random(0)
+        self.zobrist = [[rng.getrandbits(64) for _ in range(3)] for _ in range(self.n * self.n)]
+        self.zhash = 0
+        for cell in range(self.n * self.n):
+            if self.bloc_bb >> cell & 1:
+                self.zhash ^= self.zobrist[cell][2]
+        self.bloc_hash = self.zhash
+        self._compute_symmetries()
+        # the board drawing only changes in its cells
+        self.board_header = ("  " + "".join(self.LETTERS[:self.n]), " +" + "-" * self.n)
+        self.row_labels = tuple(F'{y}|' for y in range(self.n))
         # cache board evaluations
-        self.state_end = {}
-        self.state_lines = {}
         self.state_eval1 = {}
-        self.state_eval2 = {}
-        # winning lines
-        self.xs = 'X' * self.s
-        self.os = 'O' * self.s
+        # e1 scores are resized to the -1 to +1 range by this
+        self.e1_scale = 10 ** self.s
+        # e1 weight of a run of k, no run is longer than a line
+        self.pow10 = tuple(10 ** k for k in range(self.n + 1))
         logging.info(self)
 
-    def draw_board(self, board=None):
-        if board is None:
-            board = self.current_state
+    def _normalize_bloc(self, bloc):
+        # api supports (x,y) or 'XY' or ('X', y) or (y, 'X'), all read as (x, y)
+        if isinstance(bloc, str) or isinstance(bloc[0], str):
+            return ord(bloc[0].upper()) - 65, int(bloc[1])
+        if isinstance(bloc[1], str):
+            # I don't like the weird (2, 'D') syntax so let's invert it back
+            return ord(bloc[1].upper()) - 65, int(bloc[0])
+        return bloc[0], bloc[1]
+
+    def _compute_line_geometry(self):
+        # every s-long window of a row, column or diagonal that no bloc sits in, a win is (bb & m) == m
+        win_masks = []
+        # per direction: the bit shift to the next cell, the cells on those lines and the ones with a next cell
+        self.line_dirs = []
+        # per direction: the shifts to each cell of a window and the first cells of the windows free of blocs
+        self.window_dirs = []
+        for dx, dy in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            dir_mask = 0
+            next_mask = 0
+            for y in range(self.n):
+                for x in range(self.n):
+                    # only start walking from the first cell of a line
+                    if 0 <= x - dx < self.n and 0 <= y - dy < self.n:
+                        continue
+                    cells = []
+                    px, py = x, y
+                    while 0 <= px < self.n and 0 <= py < self.n:
+                        cells.append(py * self.n + px)
+                        px += dx
+                        py += dy
+                    if len(cells) < self.s:
+                        continue
+                    bits = [1 << cell for cell in cells]
+                    for start in range(len(bits) - self.s + 1):
+                        mask = sum(bits[start:start + self.s])
+                        if not mask & self.bloc_bb:
+                            win_masks.append(mask)
+                    dir_mask |= sum(bits)
+                    # anti-diagonals are read backwards so every shift is positive
+                    next_mask |= sum(bits[:-1]) if dy >= 0 else sum(bits[1:])
+            shift = abs(dy * self.n + dx)
+            self.line_dirs.append((shift, dir_mask, next_mask))
+            free = dir_mask & ~self.bloc_bb
+            starts = free
+            for _ in range(self.s - 1):
+                starts = free & (starts >> shift) & next_mask
+            self.window_dirs.append((tuple(k * shift for k in range(self.s)), starts))
+        self.win_masks = tuple(win_masks)
+        # minus the distance to the center in (-1, 0], breaks move ordering ties in favor of central cells
+        self.centrality = []
+        for cell in range(self.n * self.n):
+            x, y = cell % self.n, cell // self.n
+            distance = abs(2 * x - self.n + 1) + abs(2 * y - self.n + 1)
+            self.centrality.append(-distance / (4 * self.n))
+        # the win masks each cell is part of, a move can only complete one of these
+        self.lines_through = [tuple(m for m in self.win_masks if m >> cell & 1) for cell in range(self.n * self.n)]
+
+    def _compute_symmetries(self):
+        # rotations and reflections of the board that leave the blocs in place, as (cell permutation, inverse)
+        n = self.n
+        transforms = (
+            lambda x, y: (n - 1 - y, x),
+            lambda x, y: (n - 1 - x, n - 1 - y),
+            lambda x, y: (y, n - 1 - x),
+            lambda x, y: (n - 1 - x, y),
+            lambda x, y: (x, n - 1 - y),
+            lambda x, y: (y, x),
+            lambda x, y: (n - 1 - y, n - 1 - x),
+        )
+        self.symmetries = []
+        for transform in transforms:
+            perm = [0] * (n * n)
+            for y in range(n):
+                for x in range(n):
+                    px, py = transform(x, y)
+                    perm[y * n + x] = py * n + px
+            blocs = 0
+            for cell in range(n * n):
+                if self.bloc_bb >> cell & 1:
+                    blocs |= 1 << perm[cell]
+            if blocs != self.bloc_bb:
+                continue
+            inverse = [0] * (n * n)
+            for cell in range(n * n):
+                inverse[perm[cell]] = cell
+            self.symmetries.append((perm, inverse))
+        # zobrist keys of every cell as seen through each symmetry, and the matching board hashes
+        self.sym_keys = [[tuple(self.zobrist[perm[cell]][side] for perm, _ in self.symmetries) for side in range(2)]
+                         for cell in range(n * n)]
+        self.sym_hashes = (self.zhash,) * len(self.symmetries)
+
+    def tt_key(self):
+        # the smallest hash over the board's symmetries, and which symmetry gave it (-1 for none)
+        key = self.zhash
+        sym = -1
+        # symmetric positions only come up in the opening, later boards are keyed as they are
+        if popcount(self.x_bb | self.o_bb) >= self.n:
+            return key, sym
+        for i, h in enumerate(self.sym_hashes):
+            if h < key:
+                key = h
+                sym = i
+        return key, sym
+
+    def stabilizer(self):
+        # the symmetries that map the current position onto itself, tracked in the opening like tt_key
+        if popcount(self.x_bb | self.o_bb) >= self.n:
+            return []
+        return [perm for (perm, _), h in zip(self.symmetries, self.sym_hashes) if h == self.zhash]
+
+    def to_canonical(self, bit, sym):
+        if sym < 0 or not bit:
+            return bit
+        return 1 << self.symmetries[sym][0][bit.bit_length() - 1]
+
+    def from_canonical(self, bit, sym):
+        if sym < 0 or not bit:
+            return bit
+        return 1 << self.symmetries[sym][1][bit.bit_length() - 1]
+
+    def cells(self):
+        # flat list of the board, cell (x, y) at index y * n + x
+        cells = ['.'] * (self.n * self.n)
+        for bb, symbol in ((self.x_bb, 'X'), (self.o_bb, 'O'), (self.bloc_bb, '*')):
+            while bb:
+                bit = bb & -bb
+                bb ^= bit
+                cells[bit.bit_length() - 1] = symbol
+        return cells
+
+    def place(self, x, y, symbol):
+        cell = y * self.n + x
+        side = 0 if symbol == 'X' else 1
+        if side == 0:
+            self.x_bb |= 1 << cell
+        else:
+            self.o_bb |= 1 << cell
+        self.zhash ^= self.zobrist[cell][side]
+        self.sym_hashes = tuple(h ^ k for h, k in zip(self.sym_hashes, self.sym_keys[cell][side]))
+
+    def coords(self, bit):
+        if not bit:
+            return None, None
+        cell = bit.bit_length() - 1
+        return cell % self.n, cell // self.n
+
+    def load(self, x_bb, o_bb):
+        # replay a position onto the empty board
+        self.x_bb = 0
+        self.o_bb = 0
+        self.zhash = self.bloc_hash
+        self.sym_hashes = (self.bloc_hash,) * len(self.symmetries)
+        for bb, symbol in ((x_bb, 'X'), (o_bb, 'O')):
+            while bb:
+                bit = bb & -bb
+                bb ^= bit
+                x, y = self.coords(bit)
+                self.place(x, y, symbol)
+
+    def draw_board(self):
         size = self.n
+        cells = self.cells()
 
-        buffer = ''
-        buffer += "  " + "".join(self.LETTERS[:size]) + '\n'
-        buffer += " +" + "".join(['-' for x in range(size)]) + '\n'
-
-        for y in range(size):
-            buffer += F'{y}|'
-            for x in range(size):
-                buffer += F'{board[x][y]}'
-            buffer += '\n'
-        buffer += '\n'
+        lines = list(self.board_header)
+        for y, label in enumerate(self.row_labels):
+            lines.append(label + "".join(cells[y * size:(y + 1) * size]))
 
-        logging.info(buffer)
+        logging.info('%s\n\n', "\n".join(lines))
 
     def is_valid(self, px, py):
         if px < 0 or px >= self.n or py < 0 or py >= self.n:
             return False
-        elif self.current_state[px][py] != '.':
+        elif (self.x_bb | self.o_bb | self.bloc_bb) >> (py * self.n + px) & 1:
             return False
         else:
             return True
 
-    def read_all_lines(self, callback=None):
-        state_str = str(self.current_state)
-        if callback is None and state_str in self.state_lines:
-            return self.state_lines[state_str]
-        lines = []
-        # Horizontal & Vertical
-        for x in range(self.n):
-            row = []
-            col = []
-            for y in range(self.n):
-                row.append(self.current_state[y][x])
-                col.append(self.current_state[x][y])
-            lines.append(row)
-            lines.append(col)
-            if callback:
-                result = callback(col)
-                if result:
-                    return result
-                result = callback(row)
-                if result:
-                    return result
-        # Main Diagonal
-        for d in range(self.max_diag):
-            if d < self.split_diag:
-                x = (self.n - self.s) - d
-                y = 0
-            else:
-                x = 0
-                y = d - self.split_diag
-
-            line = []
-            while 0 <= x < self.n and 0 <= y < self.n:
-                line.append(self.current_state[x][y])
-                x += 1
-                y += 1
-            lines.append(line)
-            if callback:
-                result = callback(line)
-                if result:
-                    return result
-        # Second Diagonal
-        for d in range(self.max_diag):
-            if d <= self.split_diag:
-                x = 0
-                y = (self.s - 1) + d
-            else:
-                x = d - self.split_diag
-                y = self.n - 1
-            line = []
-            while 0 <= x < self.n and 0 <= y < self.n:
-                line.append(self.current_state[x][y])
-                x += 1
-                y -= 1
-            lines.append(line)
-            if callback:
-                result = callback(line)
-                if result:
-                    return result
-        self.state_lines[state_str] = lines
-        if callback:
-            return False
-        return lines
-
     def is_full(self):
-        for line in self.read_all_lines():
-            if '.' in line:
-                return False
-        return True
-
-    def is_end(self, depth=None):
-        state_str = str(self.current_state)
-        if state_str in self.state_end:
-            # count is_end evaluations if they reach an endgame state
-            result = self.state_end[state_str]
-            if result is not None:
-                self.turn_stats.end_count += 1
-                self.turn_stats.end_cache_hit += 1
-                if depth in self.turn_stats.eval_by_depth:
-                    self.turn_stats.eval_by_depth[depth] += 1
-                elif depth:
-                    self.turn_stats.eval_by_depth[depth] = 1
-            return result
-
-        def check_win(line):
-            line = ''.join(line)
-            if self.xs in line:
-                return 'X'
-            elif self.os in line:
-                return 'O'
-
-        result = self.read_all_lines(check_win)
-        if result:
-            # count is_end evaluations if they reach an endgame state
-            self.turn_stats.end_count += 1
-            if depth in self.turn_stats.eval_by_depth:
-                self.turn_stats.eval_by_depth[depth] += 1
-            elif depth:
-                self.turn_stats.eval_by_depth[depth] = 1
-            self.state_end[state_str] = result
-            return result
-        # Is whole board full?
-        if self.is_full():
-            result = '.'  # It's a tie!
-        else:
-            result = None  # continue game
-
-        self.state_end[state_str] = result
+        return (self.x_bb | self.o_bb | self.bloc_bb) == self.full_mask
+
+    def is_end(self, ply=None, last=0):
+        x_bb = self.x_bb
+        o_bb = self.o_bb
+        result = None
+        if last:
+            # searched positions were not over before their last move, so only its lines need checking
+            for m in self.lines_through[last.bit_length() - 1]:
+                if x_bb & m == m:
+                    result = 'X'
+                    break
+                elif o_bb & m == m:
+                    result = 'O'
+                    break
+        elif self.has_line(x_bb):
+            result = 'X'
+        elif self.has_line(o_bb):
+            result = 'O'
+        if result is None:
+            # Is whole board full?
+            if (x_bb | o_bb | self.bloc_bb) == self.full_mask:
+                return '.'  # It's a tie!
+            return None  # continue game
+
+        # count is_end evaluations if they reach an endgame state
+        self.turn_stats.end_count += 1
+        if ply:
+            self.turn_stats.evals[ply] += 1
         return result
 
+    def has_line(self, bb):
+        for shift, dir_mask, next_mask in self.line_dirs:
+            # q holds the cells starting k in a row, a whole direction is stepped at once
+            stones = bb & dir_mask
+            q = stones
+            for _ in range(self.s - 1):
+                q = stones & (q >> shift) & next_mask
+            if q:
+                return True
+        return False
+
     def check_end(self):
         self.result = self.is_end()
         # Printing the appropriate message if the game has ended
@@ -432,7 +558,7 @@ class Game:
             if self.result == '.':
                 logging.info("It's a tie!")
             else:
-                logging.info(F'The winner is {self.result}!')
+                logging.info('The winner is %s!', self.result)
             self.game_stats.summary()
             self.initialize_game()
         return self.result
@@ -463,7 +589,7 @@ class Game:
     # enough time is left to explore all the states at depth d, it must interrupt its search at depth d and
     # return values for the remaining states quickly before time is up.
 
-    def minimax(self, max=False, depth=None):
+    def minimax(self, max=False, depth=None, last=0):
         # Minimizing for 'X' and maximizing for 'O'
         # Possible values are:
         # -1 - win for 'X'
@@ -474,166 +600,468 @@ class Game:
         value = 2
         if max:
             value = -2
-        x = None
-        y = None
-        result = self.is_end(self.max_depth - depth)
+        move = 0
+        self.nodes += 1
+        if not self.nodes & self.TIME_CHECK and time.monotonic() > self.deadline:
+            raise SearchTimeout
+        ply = self.max_depth - depth
+        result = self.is_end(ply, last)
 
         if result == 'X':
-            return -1, x, y, self.max_depth - depth
+            return -1, None, None, ply
         elif result == 'O':
-            return 1, x, y, self.max_depth - depth
+            return 1, None, None, ply
         elif result == '.':
-            return 0, x, y, self.max_depth - depth
-        elif time.time() - self.search_start > self.t - self.leeway or (depth is not None and depth <= 0):
-            return self.eval(max, depth), x, y, self.max_depth - depth
-
-        children = []
-        next_depth = depth - 1 if depth else self.active_player.depth
-        for i in range(self.n):
-            for j in range(self.n):
-                if self.current_state[i][j] == '.':
-                    if max:
-                        self.current_state[i][j] = 'O'
-                        (v, _, _, adr) = self.minimax(max=False, depth=next_depth)
-                        if v > value:
-                            value = v
-                            x = i
-                            y = j
-                    else:
-                        self.current_state[i][j] = 'X'
-                        (v, _, _, adr) = self.minimax(max=True, depth=next_depth)
-                        if v < value:
-                            value = v
-                            x = i
-                            y = j
-                    self.current_state[i][j] = '.'
-                    children.append(adr)
-        return value, x, y, sum(children) / len(children)
-
-    def alphabeta(self, alpha=-2, beta=2, max=False, depth=None):
+            return 0, None, None, ply
+
+        x_bb = self.x_bb
+        o_bb = self.o_bb
+        if depth is not None and depth <= 0:
+            # the same forced blocks past the depth limit as alphabeta, so both find the same values
+            empty = 0
+            if depth > -self.quiescence:
+                win = 1 if max else -1
+                mine, theirs = (o_bb, x_bb) if max else (x_bb, o_bb)
+                if self.threats(mine, theirs):
+                    return win, None, None, ply
+                empty = self.threats(theirs, mine)
+                if empty & (empty - 1):
+                    return -win, None, None, ply
+            if not empty:
+                return self.eval(max, depth, ply), None, None, ply
+        else:
+            mine, theirs = (o_bb, x_bb) if max else (x_bb, o_bb)
+            forced = self.threats(mine, theirs) or self.threats(theirs, mine)
+            if forced:
+                # a win or the one block that doesn't lose, like alphabeta searches
+                empty = forced & -forced
+            else:
+                empty = self.full_mask & ~(x_bb | o_bb | self.bloc_bb)
+
+        adr_sum = 0
+        adr_count = 0
+        next_depth = depth - 1 if depth is not None else self.active_player.depth
+        zhash = self.zhash
+        zobrist = self.zobrist
+        minimax = self.minimax
+        while empty:
+            # pop the lowest empty cell
+            bit = empty & -empty
+            empty ^= bit
+            cell = bit.bit_length() - 1
+            if max:
+                self.o_bb = o_bb | bit
+                self.zhash = zhash ^ zobrist[cell][1]
+                (v, _, _, adr) = minimax(max=False, depth=next_depth, last=bit)
+                if v > value:
+                    value = v
+                    move = bit
+            else:
+                self.x_bb = x_bb | bit
+                self.zhash = zhash ^ zobrist[cell][0]
+                (v, _, _, adr) = minimax(max=True, depth=next_depth, last=bit)
+                if v < value:
+                    value = v
+                    move = bit
+            adr_sum += adr
+            adr_count += 1
+        self.x_bb = x_bb
+        self.o_bb = o_bb
+        self.zhash = zhash
+        x, y = self.coords(move)
+        return value, x, y, adr_sum / adr_count
+
+    def alphabeta(self, alpha=-2, beta=2, max=False, depth=None, last=0):
         # Minimizing for 'X' and maximizing for 'O'
         # Possible values are:
         # -1 - win for 'X'
         # 0  - a tie
         # 1  - loss for 'X'
-        # We're initially setting it to 2 or -2 as worse than the worst case:
-
-        value = 2
+        # searched as negamax, the window and value are flipped for 'X'
         if max:
-            value = -2
-        x = None
-        y = None
-        result = self.is_end(self.max_depth - depth)
+            return self.negamax(alpha, beta, 1, depth, last)
+        (value, x, y, adr) = self.negamax(-beta, -alpha, 0, depth, last)
+        return -value, x, y, adr
+
+    def negamax(self, alpha, beta, side, depth, last=0):
+        # side to move is 0 for 'X' and 1 for 'O', values are 1 for a win of the side to move and -1 for a loss
+        # We're initially setting it to -2 as worse than the worst case:
+
+        value = -2
+        move = 0
+        sign = 1 if side else -1
+        self.nodes += 1
+        if not self.nodes & self.TIME_CHECK and (time.monotonic() > self.deadline or
+                                                 self.cancelled is not None and self.cancelled.value):
+            raise SearchTimeout
+        ply = self.max_depth - depth
+        result = self.is_end(ply, last)
 
         if result == 'X':
-            return -1, x, y, self.max_depth - depth
+            return -sign, None, None, ply
         elif result == 'O':
-            return 1, x, y, self.max_depth - depth
+            return sign, None, None, ply
         elif result == '.':
-            return 0, x, y, self.max_depth - depth
-        elif time.time() - self.search_start > self.t - self.leeway or (depth is not None and depth <= 0):
-            return self.eval(max, depth), x, y, self.max_depth - depth
-
-        children = []
-        next_depth = depth - 1 if depth else self.active_player.depth
-        for i in range(self.n):
-            for j in range(self.n):
-                if self.current_state[i][j] == '.':
-                    if max:
-                        self.current_state[i][j] = 'O'
-                        (v, _, _, adr) = self.alphabeta(alpha, beta, max=False, depth=next_depth)
-                        if v > value:
-                            value = v
-                            x = i
-                            y = j
-                    else:
-                        self.current_state[i][j] = 'X'
-                        (v, _, _, adr) = self.alphabeta(alpha, beta, max=True, depth=next_depth)
-                        if v < value:
-                            value = v
-                            x = i
-                            y = j
-                    self.current_state[i][j] = '.'
-                    children.append(adr)
-                    if max:
-                        if value >= beta:
-                            return value, x, y, sum(children) / len(children)
-                        if value > alpha:
-                            alpha = value
-                    else:
-                        if value <= alpha:
-                            return value, x, y, sum(children) / len(children)
-                        if value < beta:
-                            beta = value
-        return value, x, y, sum(children) / len(children)
+            return 0, None, None, ply
+
+        # reuse a previous search of this position if it went at least as deep
+        key, sym = self.tt_key()
+        entry = self.tt.get(key)
+        tt_move = 0
+        if entry is not None:
+            tt_value, tt_depth, flag, tt_move = entry
+            tt_move = self.from_canonical(tt_move, sym)
+            if tt_depth >= depth:
+                if flag == self.EXACT:
+                    x, y = self.coords(tt_move)
+                    return tt_value, x, y, ply
+                elif flag == self.LOWER and tt_value > alpha:
+                    alpha = tt_value
+                elif flag == self.UPPER and tt_value < beta:
+                    beta = tt_value
+                if alpha >= beta:
+                    x, y = self.coords(tt_move)
+                    return tt_value, x, y, ply
+
+        x_bb = self.x_bb
+        o_bb = self.o_bb
+        first = []
+        if depth is not None and depth <= 0:
+            # quiescence: past the depth limit only forced blocks are searched, a line one move from completion
+            # decides the game before the eval can see it
+            empty = 0
+            if depth > -self.quiescence:
+                mine, theirs = (o_bb, x_bb) if side else (x_bb, o_bb)
+                if self.threats(mine, theirs):
+                    # wins on this move
+                    self.store(key, 1, depth, self.EXACT, 0)
+                    return 1, None, None, ply
+                empty = self.threats(theirs, mine)
+                if empty & (empty - 1):
+                    # two cells to block, the other one completes a line
+                    self.store(key, -1, depth, self.EXACT, 0)
+                    return -1, None, None, ply
+            if not empty:
+                value = sign * self.eval(side == 1, depth, ply)
+                self.store(key, value, depth, self.EXACT, 0)
+                return value, None, None, ply
+        else:
+            mine, theirs = (o_bb, x_bb) if side else (x_bb, o_bb)
+            forced = self.threats(mine, theirs) or self.threats(theirs, mine)
+            if forced:
+                # completing a line wins, otherwise the opponent's one has to be blocked as any other move loses
+                empty = forced & -forced
+            else:
+                empty = self.full_mask & ~(x_bb | o_bb | self.bloc_bb)
+                # try the previous iteration's best move and the moves that caused cutoffs at this ply first
+                killers = self.killers[ply]
+                for bit in (self.pv_move if ply == 0 else 0, tt_move, killers[0], killers[1]):
+                    if bit & empty:
+                        first.append(bit)
+                        empty ^= bit
+                first.reverse()
+
+        # alpha keeps the window this node was searched with, for the table entry
+        alpha_child = alpha
+        adr_sum = 0
+        adr_count = 0
+        next_depth = depth - 1 if depth is not None else self.active_player.depth
+        zhash = self.zhash
+        sym_hashes = self.sym_hashes
+        # the ordered moves are popped from the end, the other cells are only sorted once they are needed
+        history = self.history[side]
+        centrality = self.centrality
+        zobrist = self.zobrist
+        sym_keys = self.sym_keys
+        # the children's symmetric hashes are only needed while tt_key still looks at them
+        symmetric = sym_hashes and popcount(x_bb | o_bb) + 1 < self.n
+        # a move that mirrors one already searched leads to the same position, only one per orbit is searched
+        stabilizer = self.stabilizer() if sym_hashes else []
+        orbits = set()
+        # bound once, the loop below runs for every child
+        negamax = self.negamax
+        scout = self.SCOUT
+        other = 1 - side
+        while first or empty:
+            if not first:
+                # cells that caused the most cutoffs for this side first, ties closest to the center first
+                while empty:
+                    bit = empty & -empty
+                    empty ^= bit
+                    first.append(bit)
+                if ply == 0 and self.root_scores:
+                    # the last depth searched every root move, its scores order them before the history does
+                    root_scores = self.root_scores
+                    first.sort(key=lambda bit: (root_scores.get(bit, -2),
+                                                history[bit.bit_length() - 1] + centrality[bit.bit_length() - 1]),
+                               reverse=True)
+                else:
+                    first.sort(key=lambda bit: history[bit.bit_length() - 1] + centrality[bit.bit_length() - 1],
+                               reverse=True)
+                first.reverse()
+            bit = first.pop()
+            cell = bit.bit_length() - 1
+            if stabilizer:
+                orbit = min(cell, min(perm[cell] for perm in stabilizer))
+                if orbit in orbits:
+                    continue
+                orbits.add(orbit)
+            if side:
+                self.o_bb = o_bb | bit
+            else:
+                self.x_bb = x_bb | bit
+            self.zhash = zhash ^ zobrist[cell][side]
+            if symmetric:
+                self.sym_hashes = tuple(h ^ k for h, k in zip(sym_hashes, sym_keys[cell][side]))
+            if adr_count:
+                # principal variation search: after the first move only check that a move beats alpha
+                (v, _, _, adr) = negamax(-alpha_child - scout, -alpha_child, other, next_depth, bit)
+                if alpha_child < -v < beta:
+                    (v, _, _, adr) = negamax(-beta, -alpha_child, other, next_depth, bit)
+            else:
+                (v, _, _, adr) = negamax(-beta, -alpha_child, other, next_depth, bit)
+            adr_sum += adr
+            adr_count += 1
+            if ply == 0:
+                self.root_scores[bit] = -v
+            if -v > value:
+                value = -v
+                move = bit
+            if value >= beta:
+                self.add_killer(ply, move)
+                history[move.bit_length() - 1] += depth * depth
+                break
+            if value > alpha_child:
+                alpha_child = value
+        self.x_bb = x_bb
+        self.o_bb = o_bb
+        self.zhash = zhash
+        self.sym_hashes = sym_hashes
+        if value <= alpha:
+            self.store(key, value, depth, self.UPPER, self.to_canonical(move, sym))
+        elif value >= beta:
+            self.store(key, value, depth, self.LOWER, self.to_canonical(move, sym))
+        else:
+            self.store(key, value, depth, self.EXACT, self.to_canonical(move, sym))
+        x, y = self.coords(move)
+        return value, x, y, adr_sum / adr_count
+
+    def parallel_alphabeta(self, max=False, depth=None):
+        # the first depths are searched here, they give the order of the root moves and a root move's subtree
+        # at depth 2 is cheaper to search than to send to a worker and back
+        if depth <= 2:
+            return self.alphabeta(max=max, depth=depth)
+        if self.pool is None:
+            self.cancelled = multiprocessing.Value('b', 0)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(self.cancelled,))
+
+        empty = self.full_mask & ~(self.x_bb | self.o_bb | self.bloc_bb)
+        moves = []
+        if self.pv_move & empty:
+            moves.append(self.pv_move)
+            empty ^= self.pv_move
+        while empty:
+            bit = empty & -empty
+            empty ^= bit
+            moves.append(bit)
+        # best scores of the last depth first, bounds for the moves that only got a scout search
+        root_scores = self.root_scores
+        moves[1:] = sorted(moves[1:], key=lambda bit: root_scores.get(bit, -2), reverse=True)
+        # mirrored moves lead to the same position, keep the first of each
+        stabilizer = self.stabilizer()
+        if stabilizer:
+            orbits = set()
+            for bit in list(moves):
+                cell = bit.bit_length() - 1
+                orbit = min(cell, min(perm[cell] for perm in stabilizer))
+                if orbit in orbits:
+                    moves.remove(bit)
+                orbits.add(orbit)
+
+        def submit(bit, alpha, beta):
+            # search below one root move in a worker process
+            if max:
+                x_bb, o_bb = self.x_bb, self.o_bb | bit
+            else:
+                x_bb, o_bb = self.x_bb | bit, self.o_bb
+            return self.pool.submit(_search_move, self.n, self.s, self.blocs, self.active_player.heuristic,
+                                    x_bb, o_bb, not max, depth, alpha, beta, self.deadline)
+
+        adr_sum = 0
+        adr_count = 0
+
+        def collect(future, bit):
+            nonlocal adr_sum, adr_count
+            (v, adr, timed_out, turn_stats) = future.result()
+            self.turn_stats.merge(turn_stats)
+            adr_sum += adr
+            adr_count += 1
+            if not timed_out:
+                # the next depth orders the root moves by these, scored for the side to move like negamax does
+                self.root_scores[bit] = v if max else -v
+            return v, timed_out
+
+        def stop(futures):
+            # the moves still queued are dropped and the running ones stopped before the workers are needed again
+            self.cancelled.value = 1
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            self.cancelled.value = 0
+
+        # young brothers wait: the first move is searched alone, the others are only tested against its score
+        win = 1 if max else -1
+        move = moves[0]
+        (value, timed_out) = collect(submit(move, -2, 2), move)
+        if timed_out:
+            raise SearchTimeout
+        better = []
+        if value != win:
+            if max:
+                alpha, beta = value, value + self.SCOUT
+            else:
+                alpha, beta = value - self.SCOUT, value
+            scouts = {submit(bit, alpha, beta): bit for bit in moves[1:]}
+            for future in as_completed(scouts):
+                (v, timed_out) = collect(future, scouts[future])
+                if timed_out:
+                    # waiting on the rest would only run them past the deadline too
+                    stop(scouts)
+                    raise SearchTimeout
+                if v == win:
+                    # a won game can't be improved on
+                    stop(scouts)
+                    value = v
+                    move = scouts[future]
+                    better = []
+                    break
+                if (max and v > value) or (not max and v < value):
+                    better.append(scouts[future])
+
+        # the moves that beat the first one are searched again for their exact score
+        if better:
+            if max:
+                alpha, beta = value, 2
+            else:
+                alpha, beta = -2, value
+            searches = {submit(bit, alpha, beta): bit for bit in better}
+            scores = {}
+            for future in as_completed(searches):
+                (scores[searches[future]], timed_out) = collect(future, searches[future])
+                if timed_out:
+                    stop(searches)
+                    raise SearchTimeout
+            for bit in moves:
+                if bit in scores and ((max and scores[bit] > value) or (not max and scores[bit] < value)):
+                    value = scores[bit]
+                    move = bit
+        x, y = self.coords(move)
+        return value, x, y, adr_sum / adr_count
+
+    def close(self):
+        # the worker processes of the parallel search outlive a game, they are only stopped here
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+            self.cancelled = None
+
+    def store(self, key, value, depth, flag, move):
+        entry = self.tt.get(key)
+        if entry is None:
+            if len(self.tt) >= self.TT_SIZE:
+                self.tt.clear()
+        elif entry[1] > depth:
+            # keep the result of the deeper search
+            return
+        self.tt[key] = (value, depth, flag, move)
+
+    def threats(self, bb, other):
+        # the empty cells that complete a line of bb in one move, every window of a direction is checked at once
+        not_bb = ~bb
+        not_other = ~other
+        cells = 0
+        for offsets, starts in self.window_dirs:
+            # windows without a stone of other, missing one or more and two or more stones of bb
+            one = two = 0
+            for offset in offsets:
+                starts &= not_other >> offset
+                missing = not_bb >> offset
+                two |= one & missing
+                one |= missing
+            starts &= one & ~two
+            if starts:
+                # the missing cell is the empty one
+                for offset in offsets:
+                    cells |= (starts & (not_bb >> offset)) << offset
+        return cells
+
+    def add_killer(self, ply, bit):
+        killers = self.killers[ply]
+        if killers[0] != bit:
+            killers[1] = killers[0]
+            killers[0] = bit
 
     # prioritize chaining and building bigger lines
     def e1(self, maximize=None, depth=0):
-        # resize the score to the -1 to +1 range
-        def clamp(number):
-            return number / 10 ** self.s
-
         # use depth to prioritize less moves
         if maximize is None:
             depth = 0
         elif not maximize:
             depth = -depth
 
-        state_str = str(self.current_state)
-        if state_str in self.state_eval1:
+        zhash = self.zhash
+        if self.eval_cache and zhash in self.state_eval1:
             self.turn_stats.eval_cache_hit += 1
-            return clamp(self.state_eval1[state_str] + depth)
+            return (self.state_eval1[zhash] + depth) / self.e1_scale
         score = 0
-        for line in self.read_all_lines():
-            groups = groupby(line)
-            for label, group in groups:
-                count = sum(1 for _ in group)
-                if label == 'O':
-                    score += 10 ** count
-                elif label == 'X':
-                    score -= 10 ** count
-        self.state_eval1[state_str] = score
-        return clamp(score + depth)
+        pow10 = self.pow10
+        sides = ((self.x_bb, -1), (self.o_bb, 1))
+        for shift, dir_mask, next_mask in self.line_dirs:
+            for bb, sign in sides:
+                # q holds the cells starting k in a row, its popcount drop from k to k + 1 is the runs of k or more
+                stones = bb & dir_mask
+                q = stones
+                counts = []
+                while q:
+                    counts.append(popcount(q))
+                    q = stones & (q >> shift) & next_mask
+                counts += [0, 0]
+                for k in range(1, len(counts) - 1):
+                    # runs of exactly k
+                    runs = counts[k - 1] - 2 * counts[k] + counts[k + 1]
+                    score += sign * runs * pow10[k]
+        if self.eval_cache:
+            self.state_eval1[zhash] = score
+        return (score + depth) / self.e1_scale
 
     # prioritize blocking the other (X) player
     def e2(self):
-        score = 0
-        total_lines = self.n * 2 - 1
         # assuming downwards pointing arrows
         UNIT = 100 ** (-1 * self.s)
         BLOCK_WEIGHT = 5
 
-        lines = self.read_all_lines()
-
-        for line in lines:
-            prev = '?'
-            for curr in line:
-                if curr == prev and curr == 'X':
-                    score -= UNIT
-                if curr == prev and curr == 'O':
-                    score += UNIT
-                elif not (curr == prev):
-                    score += UNIT * BLOCK_WEIGHT
-                prev = curr
-            prev = '?'
-            for curr in reversed(line):
-                if curr == prev and curr == 'X':
-                    score -= UNIT
-                if curr == prev and curr == 'O':
-                    score += UNIT
-                elif not (curr == prev):
-                    score += UNIT * BLOCK_WEIGHT
-                prev = curr
-
-        return score
-
-    def eval(self, maximize, depth):
-        real_depth = self.max_depth - depth
+        x_bb = self.x_bb
+        o_bb = self.o_bb
+        bloc_bb = self.bloc_bb
+        empty_bb = self.full_mask & ~(x_bb | o_bb | bloc_bb)
+        score = 0
+        for shift, dir_mask, next_mask in self.line_dirs:
+            # neighbouring cells holding the same symbol, along every line of this direction
+            same = []
+            for bb in (x_bb, o_bb, bloc_bb, empty_bb):
+                cells = bb & dir_mask
+                same.append(popcount(cells & (cells >> shift) & next_mask))
+            # every cell that differs from the one before it is a block, the first cell of a line included
+            blocks = popcount(dir_mask) - sum(same)
+            score += same[1] - same[0] + BLOCK_WEIGHT * blocks
+
+        # reading the lines backwards finds the same pairs and blocks again
+        return 2 * UNIT * score
+
+    def eval(self, maximize, depth, ply):
         self.turn_stats.eval_count += 1
-        if real_depth in self.turn_stats.eval_by_depth:
-            self.turn_stats.eval_by_depth[real_depth] += 1
-        else:
-            self.turn_stats.eval_by_depth[real_depth] = 1
+        self.turn_stats.evals[ply] += 1
         if self.active_player.heuristic == Player.E1:
             return self.e1(maximize, depth)
         elif self.active_player.heuristic == Player.E2:
@@ -663,7 +1091,7 @@ class Game:
 
         player_x.summary()
         player_o.summary()
-        logging.info(F'\n')
+        logging.info('\n')
 
         while True:
             self.draw_board()
@@ -673,43 +1101,127 @@ class Game:
 
             x = y = -1
             if self.recommend or self.active_player.is_ai():
-                self.turn_stats = TurnStats()
+                self.turn_stats = TurnStats(self.active_player.depth + self.quiescence)
                 self.game_stats.turns.append(self.turn_stats)
-                self.search_start = start = time.time()
+                start = time.monotonic()
+                self.deadline = start + self.t - self.leeway
                 max = self.active_player == player_o
-                self.max_depth = depth = self.active_player.depth
-                if self.active_player.use_minimax():
-                    (m, x, y, adr) = self.minimax(max=max, depth=depth)
+                if self.active_player.use_minimax() and not self.minimax_by_alphabeta:
+                    search = self.minimax
+                elif self.workers > 1:
+                    search = self.parallel_alphabeta
                 else:  # algo == self.ALPHABETA
-                    (m, x, y, adr) = self.alphabeta(max=max, depth=depth)
-                self.turn_stats.elapsed = t = time.time() - start
+                    search = self.alphabeta
+                # iterative deepening, the last completed depth always leaves us a move to play
+                self.nodes = 0
+                self.pv_move = 0
+                # heuristics differ between players, so entries only live for one turn
+                self.tt = {}
+                self.history = [[0] * (self.n * self.n), [0] * (self.n * self.n)]
+                self.root_scores = {}
+                board = (self.x_bb, self.o_bb, self.zhash, self.sym_hashes)
+                iteration_time = 0
+                # searching deeper than the empty cells left gives the same tree again
+                empty_count = popcount(self.full_mask & ~(self.x_bb | self.o_bb | self.bloc_bb))
+                for depth in range(1, min(self.active_player.depth, empty_count) + 1):
+                    iteration_start = time.monotonic()
+                    self.max_depth = depth
+                    self.killers = [[0, 0] for _ in range(depth + self.quiescence + 1)]
+                    try:
+                        if search == self.alphabeta and depth > 1:
+                            # expect a score close to the last depth's, search again in full if it falls outside
+                            alpha = m - self.aspiration
+                            beta = m + self.aspiration
+                            result = search(alpha, beta, max=max, depth=depth)
+                            if not alpha < result[0] < beta:
+                                result = search(max=max, depth=depth)
+                        else:
+                            result = search(max=max, depth=depth)
+                    except SearchTimeout:
+                        # the search unwound without undoing its moves
+                        (self.x_bb, self.o_bb, self.zhash, self.sym_hashes) = board
+                        if depth > 1:
+                            logging.info('*** Out of time at depth %s, playing the depth %s move ***', depth, depth - 1)
+                            break
+                        # not even one ply searched, take the first free cell
+                        empty = self.full_mask & ~(self.x_bb | self.o_bb | self.bloc_bb)
+                        result = (0, *self.coords(empty & -empty), 0)
+                    (m, x, y, adr) = result
+                    self.pv_move = 1 << (y * self.n + x)
+                    # only go deeper if that depth is expected to finish, it grows like the last one did
+                    now = time.monotonic()
+                    growth = self.id_growth
+                    if iteration_time > 0 and (now - iteration_start) / iteration_time > growth:
+                        growth = (now - iteration_start) / iteration_time
+                    iteration_time = now - iteration_start
+                    if now + iteration_time * growth > self.deadline:
+                        break
+                self.turn_stats.elapsed = t = time.monotonic() - start
                 self.turn_stats.avg_recursion_depth = adr
                 if self.active_player.is_ai() and t >= self.t:
-                    logging.info(F'{self.active_player} lost, they ran out of time!')
+                    logging.info('%s lost, they ran out of time!', self.active_player)
                     break
-                elif self.t > t > self.t - self.leeway:
-                    logging.info('*** Search ran out of time ***')
-                    logging.info(F'Selected random move for {self.active_player}: {self.LETTERS[x]}{y}')
 
                 if self.active_player.is_ai():
-                    logging.info(
-                        F'Player {self.active_player} under AI control plays: {self.LETTERS[x]}{y} (score: {m})')
+                    logging.info('Player %s under AI control plays: %s%s (score: %s)',
+                                 self.active_player, self.LETTERS[x], y, m)
                 elif self.recommend:
-                    logging.info(F'Recommended move: {self.LETTERS[x]}{y} (score: {m})')
+                    logging.info('Recommended move: %s%s (score: %s)', self.LETTERS[x], y, m)
                 self.turn_stats.summary()
 
             if self.active_player.is_human():
                 (x, y) = self.input_move()
 
-            self.current_state[x][y] = self.active_player.symbol
+            self.place(x, y, self.active_player.symbol)
             self.switch_player()
 
 
+# worker processes keep one game per board setup and heuristic, its transposition table survives between moves
+_worker_games = {}
+# shared with the parent, a set flag stops the search running in the worker
+_cancelled = None
+
+
+def _init_worker(cancelled):
+    # the game trace is written by the parent process only
+    logging.disable(logging.CRITICAL)
+    global _cancelled
+    _cancelled = cancelled
+
+
+def _search_move(n, s, blocs, heuristic, x_bb, o_bb, max, depth, alpha, beta, deadline):
+    # alphabeta below a single root move, returns its value and the stats the parent adds to the turn
+    if time.monotonic() > deadline or _cancelled is not None and _cancelled.value:
+        # queued before the search ran out of time or was stopped, it would only overshoot by another TIME_CHECK nodes
+        return 0, 0, True, TurnStats()
+    key = (n, s, tuple(blocs), heuristic)
+    game = _worker_games.get(key)
+    if game is None:
+        game = _worker_games[key] = Game(n=n, s=s, b=len(blocs), blocs=list(blocs))
+        game.active_player = Player(h=heuristic)
+        game.tt = {}
+        game.history = [[0] * (n * n), [0] * (n * n)]
+    game.load(x_bb, o_bb)
+    game.turn_stats = TurnStats(depth + game.quiescence)
+    game.deadline = deadline
+    game.cancelled = _cancelled
+    game.nodes = 0
+    game.pv_move = 0
+    game.root_scores = {}
+    game.max_depth = depth
+    game.killers = [[0, 0] for _ in range(depth + game.quiescence + 1)]
+    try:
+        (v, _, _, adr) = game.alphabeta(alpha, beta, max=max, depth=depth - 1)
+    except SearchTimeout:
+        return 0, 0, True, game.turn_stats
+    return v, adr, False, game.turn_stats
+
+
 def main():
     USAGE = 'Either run directly for default parameters: ./lineEmUp.py'
-    USAGE += '\nOr with custom parameters: ./lineEmUp.py [-r] -x:<h|a> -o:<h|a> [-a:<a|m>] [-d1:<int>] [-d2:<int>] [-t:<int>]'
+    USAGE += '\nOr with custom parameters: ./lineEmUp.py [-r] -x:<h|a> -o:<h|a> [-a:<a|m>] [-d1:<int>] [-d2:<int>] [-t:<int>] [-w:<int>]'
     USAGE += '\n\nIf not specified: \n-a: AI mode will default to ALPHABETA algorithm\n-r: Recommendations will not be shown'
-    USAGE += '\n-b: blocks set to 0\n-s:  to 3\n-n: board size set to 3x3'
+    USAGE += '\n-b: blocks set to 0\n-s:  to 3\n-n: board size set to 3x3\n-w: root moves are searched in 1 process'
 
     print('sys.argv', sys.argv)
 
@@ -789,10 +1301,10 @@ def main():
                 h1_winrate = x_wins / (2 * r) * 100
                 h2_winrate = o_wins / (2 * r) * 100
 
-                logging.info('\n\n--- SCOREBOARD SUMMARY ---\ntotal games played: ' + str(r * 2))
-                logging.info('h1 winrate: ' + str(h1_winrate) + '%')
-                logging.info('h2 winrate: ' + str(h2_winrate) + '%')
-                logging.info('number of ties: ' + str(ties))
+                logging.info('\n\n--- SCOREBOARD SUMMARY ---\ntotal games played: %s', r * 2)
+                logging.info('h1 winrate: %s%%', h1_winrate)
+                logging.info('h2 winrate: %s%%', h2_winrate)
+                logging.info('number of ties: %s', ties)
 
                 sys.exit(0)
 
@@ -805,6 +1317,7 @@ def main():
         b = 0
         d1 = d2 = 10
         t = 5
+        workers = 1
 
         for arg in sys.argv:
             # show recommended moves?
@@ -867,6 +1380,8 @@ def main():
                 d1 = int(arg.split(':')[1])
             if '-d2:' in arg:
                 d2 = int(arg.split(':')[1])
+            if '-w:' in arg:
+                workers = int(arg.split(':')[1])
 
         if player_x == Player.HUMAN and player_o == Player.HUMAN:
             args_present[2] = True
@@ -881,8 +1396,12 @@ def main():
         if player_x == Player.AI and player_o == Player.AI:
             gametrace_logfile = 'gameTrace-' + str(n) + 'n' + str(b) + 'b' + str(s) + 's' + str(t) + 't.txt'
 
-        g = Game(recommend=recommend, s=s, b=b, n=n, t=search_time, d1=d1, d2=d2, gametrace_logfile=gametrace_logfile)
-        g.play(player_x=Player('X', t=player_x, a=algo_x), player_o=Player('O', t=player_o, a=algo_y))
+        g = Game(recommend=recommend, s=s, b=b, n=n, t=search_time, d1=d1, d2=d2, gametrace_logfile=gametrace_logfile,
+                 workers=workers)
+        try:
+            g.play(player_x=Player('X', t=player_x, a=algo_x), player_o=Player('O', t=player_o, a=algo_y))
+        finally:
+            g.close()
 
 
 if __name__ == "__main__":